@@ -7,15 +7,33 @@ Supports single-value lookups, series, matrices, and full company history.
 
 import xlwings as xw
 import sqlite3
+import numpy as np
 import pandas as pd
+import atexit
 import configparser
+import math
 import os
+import queue
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 from functools import lru_cache, wraps
+from pathlib import Path
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import threading
 import time
 
+try:  # Optional C parser for ISO-8601 dates; falls back to the stdlib
+    import ciso8601
+except ImportError:
+    ciso8601 = None
+
+try:  # Optional Arrow-based reader for tabular queries; see use_connectorx in config.ini
+    import connectorx as cx
+except ImportError:
+    cx = None
+
 # -------------------------------------------------------------------
 # CONFIGURATION
 # -------------------------------------------------------------------
@@ -27,77 +45,473 @@ config.read(CONFIG_FILE)
 
 DB_PATH = config.get('DATABASE', 'db_path', fallback='valuations.db')
 TABLE_NAME = config.get('DATABASE', 'table_name', fallback='valuations')
+READ_CONNECTIONS = config.getint('DATABASE', 'read_connections', fallback=4)
+USE_CONNECTORX = config.getboolean('DATABASE', 'use_connectorx', fallback=False) and cx is not None
 DATE_FORMAT = config.get('FORMAT', 'date_format', fallback='%Y-%m-%d')
+CACHE_MAX_ENTRIES = config.getint('CACHE', 'max_entries', fallback=128)
+CACHE_MAX_SECONDS = config.getfloat('CACHE', 'max_cache_seconds', fallback=300)
+CACHE_MAX_PINNED = config.getint('CACHE', 'max_pinned_results', fallback=64)
+LOG_LEVEL = config.get('LOGGING', 'level', fallback='INFO').upper()
 
 # -------------------------------------------------------------------
 # LOGGING
 # -------------------------------------------------------------------
+# UDFs only enqueue log records; a background listener thread does the file
+# writes and rollovers so Excel never waits on disk I/O.
 logger = logging.getLogger("DailyDataLogger")
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
 if not logger.handlers:  # Prevents duplicate handlers in Excel context
     handler = RotatingFileHandler(LOG_FILE, maxBytes=1_000_000, backupCount=3, encoding='utf-8')
     formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s", "%Y-%m-%d %H:%M:%S")
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    log_queue = queue.SimpleQueue()
+    log_listener = QueueListener(log_queue, handler)
+    log_listener.start()
+    atexit.register(log_listener.stop)  # flush queued records on shutdown
+    logger.addHandler(QueueHandler(log_queue))
+
+# SQL timing for the UDF call in progress, reported on log_call's line
+_call_stats = threading.local()
 
 # -------------------------------------------------------------------
 # DATABASE CONNECTION
 # -------------------------------------------------------------------
+# A single read-write connection is opened on first use and kept for the
+# lifetime of the Excel session; it owns setup (WAL, indexes) and shutdown
+# (PRAGMA optimize). Queries run on a pool of read-only connections so calls
+# from different threads don't serialize on one connection.
+_CONN = None
+_CONN_LOCK = threading.Lock()
+_READ_POOL = None  # queue.Queue of idle read-only connections
+_FIELDS = {}  # lower-cased column name -> column name, read from the table on connect
+_FIELD_DTYPES = {}  # lower-cased column name -> numpy dtype used for cached columns
+
+_READ_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+_PRAGMAS = ("PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL") + _READ_PRAGMAS
+
+# Indexes matching each UDF's WHERE/ORDER BY, so SQLite can seek and read rows
+# already in order instead of scanning and sorting. Kept in sync with schema.sql.
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_accord_date ON {table} (accord_code, date)",
+    "CREATE INDEX IF NOT EXISTS idx_mcap_date_pe ON {table} (mcap_category, date, pe DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_sector_date_pe ON {table} (sector, date, pe DESC)",
+)
+
+def _column_dtype(decl_type: str, notnull: int):
+    """Map a declared SQLite column type to a numpy dtype, following SQLite's affinity rules."""
+    decl_type = (decl_type or "").upper()
+    if "INT" in decl_type:
+        # Nullable integers become float64 so NULL can be held as NaN
+        return np.int64 if notnull else np.float64
+    if any(t in decl_type for t in ("REAL", "FLOA", "DOUB")):
+        return np.float64
+    return object
+
+def _ensure_indexes(conn):
+    """Create any missing indexes in one transaction, then refresh planner statistics."""
+    count_sql = "SELECT COUNT(*) FROM sqlite_master WHERE type='index' AND tbl_name=?"
+    try:
+        before = conn.execute(count_sql, (TABLE_NAME,)).fetchone()[0]
+        with conn:
+            conn.execute("BEGIN")
+            for stmt in _INDEXES:
+                conn.execute(stmt.format(table=TABLE_NAME))
+        if conn.execute(count_sql, (TABLE_NAME,)).fetchone()[0] != before:
+            conn.execute("ANALYZE")
+            logger.info(f"Created missing indexes for table {TABLE_NAME}.")
+    except sqlite3.DatabaseError as e:  # e.g. read-only DB file
+        logger.warning(f"Automatic index creation skipped: {e}")
+
 def _get_connection():
-    if not os.path.exists(DB_PATH):
-        raise FileNotFoundError(f"SQLite DB not found at path: {DB_PATH}")
-    return sqlite3.connect(DB_PATH)
+    global _CONN
+    if _CONN is None:
+        with _CONN_LOCK:
+            if _CONN is None:
+                if not os.path.exists(DB_PATH):
+                    raise FileNotFoundError(f"SQLite DB not found at path: {DB_PATH}")
+                conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+                for pragma in _PRAGMAS:
+                    try:
+                        conn.execute(pragma)
+                    except sqlite3.DatabaseError as e:  # e.g. WAL on a read-only DB file
+                        logger.warning(f"{pragma} skipped: {e}")
+                _ensure_indexes(conn)
+                for _, name, decl_type, notnull, _, _ in conn.execute(f"PRAGMA table_info({TABLE_NAME})"):
+                    _FIELDS[name.lower()] = name
+                    _FIELD_DTYPES[name.lower()] = _column_dtype(decl_type, notnull)
+                _CONN = conn
+                atexit.register(_close_connections)
+    return _CONN
+
+def _get_read_pool():
+    global _READ_POOL
+    if _READ_POOL is None:
+        _get_connection()  # the RW connection must exist first so WAL is already on
+        with _CONN_LOCK:
+            if _READ_POOL is None:
+                uri = Path(DB_PATH).resolve().as_uri() + "?mode=ro"
+                pool = queue.Queue()
+                for _ in range(max(1, READ_CONNECTIONS)):
+                    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=256)
+                    for pragma in _READ_PRAGMAS:
+                        conn.execute(pragma)
+                    pool.put(conn)
+                _READ_POOL = pool
+    return _READ_POOL
+
+@contextmanager
+def _read_connection():
+    pool = _get_read_pool()
+    conn = pool.get()
+    try:
+        yield conn
+    finally:
+        pool.put(conn)
+
+def _close_connections():
+    """Let SQLite refresh its statistics, then close every connection (run at exit)."""
+    if _READ_POOL is not None:
+        while not _READ_POOL.empty():
+            _READ_POOL.get_nowait().close()
+    if _CONN is not None:
+        try:
+            _CONN.execute("PRAGMA optimize")
+        except sqlite3.DatabaseError:
+            pass
+        _CONN.close()
+
+# -------------------------------------------------------------------
+# SQL STATEMENTS
+# -------------------------------------------------------------------
+# Field names cannot be bound as parameters, so each (udf, field) pair is
+# rendered once from a template (see _specialize) and reused. Identical SQL
+# text lets SQLite's statement cache skip re-parsing and re-planning.
+_SQL_TEMPLATES = {
+    "get_daily_data": "SELECT {field} FROM {table} WHERE accord_code=? AND date=?",
+    "get_series": "SELECT date, {field} FROM {table} WHERE accord_code=? AND date BETWEEN ? AND ? ORDER BY date",
+    "get_daily_matrix": "SELECT accord_code, company_name, sector, mcap_category, {field} FROM {table} WHERE date=? ORDER BY accord_code",
+    "get_all_pe": "SELECT date, {field} FROM {table} WHERE accord_code=? ORDER BY date",
+    "get_mcap_matrix": "SELECT accord_code, company_name, sector, pe FROM {table} WHERE mcap_category=? AND date=? ORDER BY pe DESC",
+    "get_pe_for_sector": "SELECT accord_code, company_name, mcap_category, pe FROM {table} WHERE sector=? AND date=? ORDER BY pe DESC",
+}
+
+def _get_sql(udf_name: str, column: str = None) -> str:
+    return _SQL_TEMPLATES[udf_name].format(field=column, table=TABLE_NAME)
 
 # -------------------------------------------------------------------
 # CACHING AND QUERY EXECUTION
 # -------------------------------------------------------------------
-@lru_cache(maxsize=128)
+# Results are stored column-wise as (columns, arrays) with read-only numpy
+# arrays, or as a single row tuple for get_daily_data, so no caller can mutate
+# a cached entry. Entries expire after CACHE_MAX_SECONDS and the cache is
+# LRU-bounded by CACHE_MAX_ENTRIES. Finished matrix results are pinned
+# separately, see pin_result.
+_QUERY_CACHE = OrderedDict()  # (sql, params) -> (expires_at, result)
+_CACHE_LOCK = threading.Lock()
+
+_FETCH_BATCH = 2000  # rows per fetchmany() call, and the initial column capacity
+
+def _fetch_columnar(sql: str, params: tuple):
+    with _read_connection() as conn:
+        cur = conn.execute(sql, params)
+        cur.arraysize = _FETCH_BATCH
+        columns = tuple(col[0] for col in cur.description)
+        arrays = [np.empty(_FETCH_BATCH, dtype=_FIELD_DTYPES.get(name.lower(), object)) for name in columns]
+        n = 0
+        while True:
+            batch = cur.fetchmany()
+            if not batch:
+                break
+            end = n + len(batch)
+            if end > len(arrays[0]):
+                size = max(end, 2 * len(arrays[0]))
+                arrays = [np.resize(arr, size) for arr in arrays]
+            for i, col in enumerate(zip(*batch)):
+                if arrays[i].dtype.kind == "i":
+                    tmp = np.asarray(col)
+                    if tmp.dtype.kind == "i":
+                        col = tmp
+                    else:
+                        # numpy would silently truncate a REAL stored in an INTEGER column
+                        arrays[i] = arrays[i].astype(np.float64 if tmp.dtype.kind == "f" else object)
+                try:
+                    arrays[i][n:end] = col
+                except (TypeError, ValueError):  # SQLite allows values that don't match the declared type
+                    arrays[i] = arrays[i].astype(object)
+                    arrays[i][n:end] = col
+            n = end
+    result = []
+    for arr in arrays:
+        arr = arr[:n].copy()  # drop the unused capacity
+        arr.flags.writeable = False
+        result.append(arr)
+    return columns, tuple(result)
+
+def _sql_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def _fetch_columnar_cx(sql: str, params: tuple):
+    """
+    Same result shape as _fetch_columnar, read through connectorx. connectorx
+    has no parameter binding, so params are inlined as quoted SQL literals;
+    the templates contain no literal '?' characters.
+    """
+    parts = sql.split("?")
+    bound = parts[0] + "".join(_sql_literal(p) + part for p, part in zip(params, parts[1:]))
+    uri = "sqlite://" + os.path.abspath(DB_PATH).replace("\\", "/")
+    df = cx.read_sql(uri, bound, return_type="pandas")
+    arrays = []
+    for name in df.columns:
+        arr = df[name].to_numpy(copy=True)
+        arr.flags.writeable = False
+        arrays.append(arr)
+    return tuple(df.columns), tuple(arrays)
+
+_MISS = object()
+
+def _cache_get(key):
+    """Return the cached result for key, or _MISS if absent or expired."""
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        entry = _QUERY_CACHE.get(key)
+        if entry is None:
+            return _MISS
+        if entry[0] <= now:
+            del _QUERY_CACHE[key]
+            return _MISS
+        _QUERY_CACHE.move_to_end(key)
+        return entry[1]
+
+def _cache_put(key, result):
+    with _CACHE_LOCK:
+        _QUERY_CACHE[key] = (time.monotonic() + CACHE_MAX_SECONDS, result)
+        _QUERY_CACHE.move_to_end(key)
+        while len(_QUERY_CACHE) > CACHE_MAX_ENTRIES:
+            _QUERY_CACHE.popitem(last=False)
+
 def _cached_query(sql: str, params: tuple):
-    conn = _get_connection()
-    try:
-        df = pd.read_sql_query(sql, conn, params=params)
-        return df
-    finally:
-        conn.close()
+    key = (sql, params)
+    result = _cache_get(key)
+    if result is not _MISS:
+        return result
+
+    result = None
+    if USE_CONNECTORX:
+        try:
+            result = _fetch_columnar_cx(sql, params)
+        except Exception as e:
+            logger.warning(f"connectorx read failed, using sqlite3 instead: {e}")
+    if result is None:
+        result = _fetch_columnar(sql, params)
+    _cache_put(key, result)
+    return result
+
+def _clear_query_cache():
+    with _CACHE_LOCK:
+        _QUERY_CACHE.clear()
+        _PINNED_RESULTS.clear()
+
+def _cached_scalar(sql: str, params: tuple):
+    """Fetch only the first row as a plain tuple, skipping DataFrame construction."""
+    key = (sql, params, "row")  # kept apart from the tabular entry for the same SQL
+    row = _cache_get(key)
+    if row is _MISS:
+        with _read_connection() as conn:
+            row = conn.execute(sql, params).fetchone()
+        _cache_put(key, row)
+    return row
 
 def _run_query_df(sql: str, params: tuple = ()):
-    start = time.perf_counter()
-    df = _cached_query(sql, params)
-    duration_ms = round((time.perf_counter() - start) * 1000, 3)
-    logger.info(f"SQL executed | Duration={duration_ms} ms | Params={params}")
+    timed = logger.isEnabledFor(logging.INFO)  # skip the clock reads when nothing is logged
+    if timed:
+        start = time.perf_counter()
+    columns, arrays = _cached_query(sql, params)
+    df = pd.DataFrame(dict(zip(columns, arrays)), columns=columns)  # copies, so callers may mutate it
+    if timed:
+        _call_stats.sql = (round((time.perf_counter() - start) * 1000, 3), params)
     return df
 
+def _run_query_scalar(sql: str, params: tuple = ()):
+    timed = logger.isEnabledFor(logging.INFO)
+    if timed:
+        start = time.perf_counter()
+    row = _cached_scalar(sql, params)
+    if timed:
+        _call_stats.sql = (round((time.perf_counter() - start) * 1000, 3), params)
+    return row
+
 # -------------------------------------------------------------------
 # INPUT VALIDATION & DATE FORMATTING
 # -------------------------------------------------------------------
 def _validate_inputs(**kwargs):
     for k, v in kwargs.items():
-        if v is None or str(v).strip() == "":
+        # Only strings can be blank; numbers from Excel skip the str() round-trip
+        if v is None or (isinstance(v, str) and not v.strip()):
             raise ValueError(f"Missing required input: {k}")
 
-def _format_date_for_db(date_value: str) -> str:
-    """Convert Excel input date to DB-compatible text (YYYY-MM-DD)."""
+def _coerce_code(accord_code) -> int:
+    """Excel passes numbers as floats; ints are returned as-is."""
+    return accord_code if isinstance(accord_code, int) else int(float(accord_code))
+
+def _resolve_field(field: str) -> str:
+    """Return the table's column name for a user-supplied field, or raise if it isn't one."""
+    _get_connection()  # populates _FIELDS
+    column = _FIELDS.get(str(field).strip().lower())
+    if column is None:
+        raise ValueError(f"Unknown field: {field}")
+    return column
+
+_parse_iso = ciso8601.parse_datetime if ciso8601 is not None else datetime.fromisoformat
+
+def _parse_date(date_value) -> datetime:
+    """Parse an ISO date string, using strptime only when the fast path rejects it."""
+    text = str(date_value).strip()
     try:
-        dt = datetime.strptime(str(date_value).strip(), "%Y-%m-%d")
+        return _parse_iso(text)
+    except ValueError:
+        return datetime.strptime(text, "%Y-%m-%d")
+
+# Both formatters are memoized: the same dates recur across cells and rows.
+@lru_cache(maxsize=16384)
+def _format_date_for_db_cached(date_value: str) -> str:
+    try:
+        dt = _parse_date(date_value)
         return dt.strftime("%Y-%m-%d")
     except Exception:
         return str(date_value).strip()
 
-def _format_date_for_excel(date_value: str) -> str:
-    """Format date for Excel output according to config.ini."""
+def _format_date_for_db(date_value: str) -> str:
+    """Convert Excel input date to DB-compatible text (YYYY-MM-DD)."""
+    try:
+        return _format_date_for_db_cached(date_value)
+    except TypeError:  # unhashable input, e.g. a multi-cell range
+        return _format_date_for_db_cached.__wrapped__(date_value)
+
+def _reformat_date(date_value) -> str:
     try:
-        dt = datetime.strptime(str(date_value).strip(), "%Y-%m-%d")
+        dt = _parse_date(date_value)
         return dt.strftime(DATE_FORMAT)
     except Exception:
         return str(date_value).strip()
 
+@lru_cache(maxsize=16384)
+def _format_date_for_excel(date_value: str) -> str:
+    """Format date for Excel output according to config.ini."""
+    if DATE_FORMAT != "%Y-%m-%d":  # the map is only worth building for a different format
+        formatted = _date_fmt_map().get(date_value)
+        if formatted is not None:
+            return formatted
+    return _reformat_date(date_value)
+
+def _format_dates_vectorized(dates: pd.Series) -> pd.Series:
+    parsed = pd.to_datetime(dates, format="%Y-%m-%d", errors="coerce", cache=True)
+    formatted = parsed.dt.strftime(DATE_FORMAT).astype(object)
+    leftover = parsed.isna()
+    if leftover.any():
+        # Apply the scalar parser's rules (ISO variants, non-padded dates) to the few
+        # values the strict format rejects, so every UDF formats a date the same way
+        formatted[leftover] = [_reformat_date(v) for v in dates[leftover]]
+    return formatted
+
+# DB date text -> Excel date text for every date in the table, built with one
+# vectorized parse on first use and rebuilt after clear_cache. Dates missing
+# from the map (e.g. rows added since) are formatted on the fly.
+_DATE_FMT_MAP = None
+
+def _date_fmt_map() -> dict:
+    global _DATE_FMT_MAP
+    fmt_map = _DATE_FMT_MAP
+    if fmt_map is None:
+        with _read_connection() as conn:
+            rows = conn.execute(f"SELECT DISTINCT date FROM {TABLE_NAME}").fetchall()
+        dates = pd.Series([row[0] for row in rows], dtype=object)
+        # Built privately and published whole, so readers never see a partial map
+        fmt_map = dict(zip(dates, _format_dates_vectorized(dates)))
+        with _CACHE_LOCK:
+            _DATE_FMT_MAP = fmt_map
+    return fmt_map
+
+def _format_date_series(dates: pd.Series) -> pd.Series:
+    """_format_date_for_excel for a whole DB date column, via _DATE_FMT_MAP lookups."""
+    if DATE_FORMAT == "%Y-%m-%d":
+        return dates
+    formatted = dates.map(_date_fmt_map())
+    missing = formatted.isna()
+    if missing.any():
+        formatted[missing] = _format_dates_vectorized(dates[missing])
+    return formatted
+
+# -------------------------------------------------------------------
+# SPECIALIZED QUERY RUNNERS
+# -------------------------------------------------------------------
+_DATE_LEADING_UDFS = {"get_series", "get_all_pe"}
+
+def _specialize(udf_name: str, field: str = None):
+    """
+    Return the query runner for one (udf, field) pair. Field validation, SQL
+    rendering and the choice of output handling happen once per pair instead
+    of on every call; the returned run(*params) only executes the query.
+    """
+    try:
+        return _build_runner(udf_name, field)
+    except TypeError:  # unhashable field, e.g. a multi-cell range; rejected uncached
+        return _build_runner.__wrapped__(udf_name, field)
+
+@lru_cache(maxsize=None)
+def _build_runner(udf_name: str, field: str = None):
+    column = _resolve_field(field) if field is not None else None
+    sql = _get_sql(udf_name, column)
+
+    if udf_name == "get_daily_data":
+        def run(*params):
+            return _run_query_scalar(sql, params)
+        return run
+
+    selects_date = udf_name in _DATE_LEADING_UDFS or column == "date"
+    if not selects_date or DATE_FORMAT == "%Y-%m-%d":
+        def run(*params):
+            return _run_query_df(sql, params)
+        return run
+
+    def run(*params):
+        df = _run_query_df(sql, params)
+        if not df.empty:
+            df['date'] = _format_date_series(df['date'])
+        return df
+    return run
+
 # -------------------------------------------------------------------
 # LOGGING DECORATOR
 # -------------------------------------------------------------------
+_MAX_LOGGED_ITEMS = 32
+
+def _param_repr(value) -> str:
+    """repr() for log lines, summarising large ranges/arrays instead of dumping them."""
+    shape = getattr(value, 'shape', None)
+    if shape and math.prod(shape) > _MAX_LOGGED_ITEMS:
+        return f"<{type(value).__name__} shape={shape}>"
+    if isinstance(value, (list, tuple)):
+        # Excel ranges arrive as lists of rows, so count the cells, not just the rows
+        cells = sum(len(row) if isinstance(row, (list, tuple)) else 1 for row in value)
+        if cells > _MAX_LOGGED_ITEMS:
+            return f"<{type(value).__name__} len={len(value)} cells={cells}>"
+    return repr(value)
+
 def log_call(func):
     @wraps(func)
     def wrapper(*args):
+        if not logger.isEnabledFor(logging.INFO):
+            return func(*args)
         start_time = time.perf_counter()
+        _call_stats.sql = None
         status = "SUCCESS"
         error_msg = None
         try:
@@ -109,13 +523,49 @@ def log_call(func):
             raise
         finally:
             duration_ms = round((time.perf_counter() - start_time) * 1000, 3)
-            params_str = ", ".join([repr(a) for a in args])
+            params_str = ", ".join([_param_repr(a) for a in args])
             msg = f"Function={func.__name__} | Params=({params_str}) | Time={duration_ms} ms | Status={status}"
+            if _call_stats.sql is not None:
+                sql_ms, sql_params = _call_stats.sql
+                msg += f" | SQL={sql_ms} ms | SQLParams={sql_params}"
             if error_msg:
                 msg += f" | Error='{error_msg}'"
             logger.info(msg)
     return wrapper
 
+# -------------------------------------------------------------------
+# PINNED RESULTS DECORATOR
+# -------------------------------------------------------------------
+# Matrix UDFs are often referenced by many cells with identical arguments.
+# Their finished DataFrames are kept per (udf, *args) so a repeat call returns
+# before any validation, SQL or cache lookup; each caller gets its own copy.
+# Entries share the query cache's expiry, are evicted oldest-first beyond
+# CACHE_MAX_PINNED, and are otherwise only dropped by clear_cache.
+_PINNED_RESULTS = {}  # (udf_name, *args) -> (expires_at, DataFrame)
+
+def pin_result(func):
+    @wraps(func)
+    def wrapper(*args):
+        key = (func.__name__,) + args
+        try:
+            hash(key)
+        except TypeError:  # e.g. a range passed as a list
+            return func(*args)
+        now = time.monotonic()
+        with _CACHE_LOCK:
+            entry = _PINNED_RESULTS.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1].copy()
+        result = func(*args)
+        if isinstance(result, pd.DataFrame):  # "No data found" messages are not pinned
+            with _CACHE_LOCK:
+                _PINNED_RESULTS.pop(key, None)
+                _PINNED_RESULTS[key] = (now + CACHE_MAX_SECONDS, result.copy())
+                while len(_PINNED_RESULTS) > CACHE_MAX_PINNED:
+                    del _PINNED_RESULTS[next(iter(_PINNED_RESULTS))]
+        return result
+    return wrapper
+
 # -------------------------------------------------------------------
 # UDFS
 # -------------------------------------------------------------------
@@ -124,88 +574,77 @@ def log_call(func):
 @log_call
 def get_daily_data(accord_code, field: str, date_value: str):
     _validate_inputs(accord_code=accord_code, field=field, date_value=date_value)
-    accord_code = int(float(accord_code))
+    accord_code = _coerce_code(accord_code)
     formatted_date = _format_date_for_db(date_value)
-    sql = f"SELECT {field} FROM {TABLE_NAME} WHERE accord_code=? AND date=?"
-    df = _run_query_df(sql, (accord_code, formatted_date))
-    if df.empty:
+    row = _specialize("get_daily_data", field)(accord_code, formatted_date)
+    if row is None:
         return [[f"No data found for {accord_code} on {formatted_date}"]]
     # Always return as a table, not just value, for Excel expand compatibility
-    return [[df.iloc[0, 0]]]
+    return [[row[0]]]
 
 @xw.func(category="Finance UDFs")
-@xw.ret(expand='table')
+@xw.ret(expand='table', index=False, header=True)
 @log_call
 def get_series(accord_code, field: str, start_date: str, end_date: str):
     _validate_inputs(accord_code=accord_code, field=field, start_date=start_date, end_date=end_date)
-    accord_code = int(float(accord_code))
+    accord_code = _coerce_code(accord_code)
     start_fmt = _format_date_for_db(start_date)
     end_fmt = _format_date_for_db(end_date)
-    sql = f"SELECT date, {field} FROM {TABLE_NAME} WHERE accord_code=? AND date BETWEEN ? AND ? ORDER BY date"
-    df = _run_query_df(sql, (accord_code, start_fmt, end_fmt))
+    df = _specialize("get_series", field)(accord_code, start_fmt, end_fmt)
     if df.empty:
         return [[f"No data found for {accord_code} between {start_fmt} and {end_fmt}"]]
-    df['date'] = df['date'].apply(_format_date_for_excel)
-    result = [df.columns.tolist()] + df.values.tolist()
-    return result
+    return df
 
 @xw.func(category="Finance UDFs")
-@xw.ret(expand='table')
+@xw.ret(expand='table', index=False, header=True)
 @log_call
+@pin_result
 def get_daily_matrix(date_value: str, field: str):
     _validate_inputs(date_value=date_value, field=field)
     formatted_date = _format_date_for_db(date_value)
-    sql = f"SELECT accord_code, company_name, sector, mcap_category, {field} FROM {TABLE_NAME} WHERE date=? ORDER BY accord_code"
-    df = _run_query_df(sql, (formatted_date,))
+    df = _specialize("get_daily_matrix", field)(formatted_date)
     if df.empty:
         return [[f"No data found for {formatted_date}"]]
-    # If date column is present add formatted date, else omit
-    if 'date' in df.columns:
-        df['date'] = df['date'].apply(_format_date_for_excel)
-    result = [df.columns.tolist()] + df.values.tolist()
-    return result
+    return df
 
 @xw.func(category="Finance UDFs")
-@xw.ret(expand='table')
+@xw.ret(expand='table', index=False, header=True)
 @log_call
 def get_all_pe(accord_code, field: str):
     _validate_inputs(accord_code=accord_code, field=field)
-    accord_code = int(float(accord_code))
-    sql = f"SELECT date, {field} FROM {TABLE_NAME} WHERE accord_code=? ORDER BY date"
-    df = _run_query_df(sql, (accord_code,))
+    accord_code = _coerce_code(accord_code)
+    df = _specialize("get_all_pe", field)(accord_code)
     if df.empty:
         return [[f"No data found for {accord_code}"]]
-    df['date'] = df['date'].apply(_format_date_for_excel)
-    result = [df.columns.tolist()] + df.values.tolist()
-    return result
+    return df
 
 @xw.func(category="Finance UDFs")
-@xw.ret(expand='table')
+@xw.ret(expand='table', index=False, header=True)
 @log_call
+@pin_result
 def get_mcap_matrix(mcap_category: str, date_value: str):
     _validate_inputs(mcap_category=mcap_category, date_value=date_value)
     formatted_date = _format_date_for_db(date_value)
-    sql = f"SELECT accord_code, company_name, sector, pe FROM {TABLE_NAME} WHERE mcap_category=? AND date=? ORDER BY pe DESC"
-    df = _run_query_df(sql, (mcap_category, formatted_date))
+    df = _specialize("get_mcap_matrix")(mcap_category, formatted_date)
     if df.empty:
         return [[f"No data found for {mcap_category} on {formatted_date}"]]
-    df['date'] = formatted_date
-    result = [df.columns.tolist()] + df.values.tolist()
-    return result
+    # The query doesn't select date; add it as the leading column, as in get_series
+    df.insert(0, 'date', _format_date_for_excel(formatted_date))
+    return df
 
 @xw.func(category="Finance UDFs")
-@xw.ret(expand='table')
+@xw.ret(expand='table', index=False, header=True)
 @log_call
+@pin_result
 def get_pe_for_sector(sector: str, date_value: str):
     _validate_inputs(sector=sector, date_value=date_value)
     formatted_date = _format_date_for_db(date_value)
-    sql = f"SELECT accord_code, company_name, mcap_category, pe FROM {TABLE_NAME} WHERE sector=? AND date=? ORDER BY pe DESC"
-    df = _run_query_df(sql, (sector, formatted_date))
+    df = _specialize("get_pe_for_sector")(sector, formatted_date)
     if df.empty:
         return [[f"No data found for sector {sector} on {formatted_date}"]]
-    df['date'] = formatted_date
-    result = [df.columns.tolist()] + df.values.tolist()
-    return result
+    # The query doesn't select date; add it as the leading column, as in get_series
+    df.insert(0, 'date', _format_date_for_excel(formatted_date))
+    return df
 
 # -------------------------------------------------------------------
 # CACHE CLEAR
@@ -213,7 +652,18 @@ def get_pe_for_sector(sector: str, date_value: str):
 @xw.func
 @log_call
 def clear_cache():
-    _cached_query.cache_clear()
+    # Data caches are reset; the connections stay open.
+    global _DATE_FMT_MAP
+    _clear_query_cache()
+    _format_date_for_excel.cache_clear()
+    with _CACHE_LOCK:
+        _DATE_FMT_MAP = None
+    # The data may have changed, so let SQLite refresh the statistics its planner uses
+    if _CONN is not None:
+        try:
+            _CONN.execute("PRAGMA optimize")
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"PRAGMA optimize skipped: {e}")
     return "Cache cleared successfully."
 
 # -------------------------------------------------------------------
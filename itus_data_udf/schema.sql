@@ -1 +1,4 @@
 CREATE INDEX IF NOT EXISTS idx_accord_date ON valuations (accord_code, date);
+CREATE INDEX IF NOT EXISTS idx_mcap_date_pe ON valuations (mcap_category, date, pe DESC);
+CREATE INDEX IF NOT EXISTS idx_sector_date_pe ON valuations (sector, date, pe DESC);
+ANALYZE;